@@ -41,14 +41,18 @@ FUTURE:
 
 import ee
 import datetime
-import io
 import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import google.oauth2.credentials
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build as gdrive_build
+from googleapiclient.errors import HttpError
 
 # ── Constants ─────────────────────────────────────────────────────────────────
 PROJECT_ID   = "famm-472015"
@@ -57,6 +61,11 @@ COUNTRY      = "Ghana"
 SCALE        = 10
 BANDS        = ["B2","B3","B4","B5","B6","B7","B8","B8A","B11","B12"]
 
+# Parallel Drive downloads per region (FAMM_DOWNLOAD_WORKERS overrides)
+DOWNLOAD_WORKERS = max(1, int(os.environ.get("FAMM_DOWNLOAD_WORKERS", "6")))
+CHUNK_SIZE       = 50 * 1024 * 1024
+DOWNLOAD_RETRIES = 5    # consecutive failed chunks before a tile download gives up
+
 today = datetime.date.today()
 
 # Scopes the credentials MUST have been issued with
@@ -132,6 +141,11 @@ def initialize_ee(creds_data: dict):
 
 # ── Build Drive client ────────────────────────────────────────────────────────
 def build_drive_service(creds_data: dict):
+    """
+    Drive v3 client on its own authorised httplib2 transport. The transport
+    keeps its TLS connection alive, so every chunk and file fetched through
+    this client reuses one handshake.
+    """
     try:
         oauth_creds = google.oauth2.credentials.Credentials(
             token            = None,
@@ -142,24 +156,35 @@ def build_drive_service(creds_data: dict):
             scopes           = ["https://www.googleapis.com/auth/drive"],
             quota_project_id = PROJECT_ID
         )
-        return gdrive_build("drive", "v3", credentials=oauth_creds)
+        http = AuthorizedHttp(oauth_creds, http=httplib2.Http(timeout=60))
+        return gdrive_build("drive", "v3", http=http, cache_discovery=False)
     except Exception as e:
         print(f"❌ Drive client build failed: {e}")
         sys.exit(1)
 
 
-# ── Sentinel-2 cloud masking (Rosemary's logic — unchanged) ──────────────────
-def mask_s2(image, roi):
-    image_date = image.date()
-    cloud_col  = (
-        ee.ImageCollection("COPERNICUS/S2_CLOUD_PROBABILITY")
-        .filterBounds(roi)
-        .filterDate(image_date.advance(-3, "day"), image_date.advance(3, "day"))
-        .sort("system:time_start")
-    )
+_thread_local = threading.local()
+
+
+def thread_drive_service(creds_data: dict):
+    """Drive client owned by the calling thread — service objects are not thread-safe."""
+    service = getattr(_thread_local, "drive", None)
+    if service is None:
+        service = _thread_local.drive = build_drive_service(creds_data)
+    return service
+
+
+# ── Sentinel-2 cloud masking (Rosemary's thresholds) ─────────────────────────
+def mask_s2(image):
+    """
+    Mask clouds using the s2cloudless probability image attached as the
+    'cloud' property by build_composite's join. Images without a matching
+    probability granule are left unmasked, as before.
+    """
+    cloud_prob = image.get("cloud")
     cloud_mask = ee.Image(ee.Algorithms.If(
-        cloud_col.size().gt(0),
-        ee.Image(cloud_col.first()).select("probability").lt(60),
+        cloud_prob,
+        ee.Image(cloud_prob).select("probability").lt(60),
         ee.Image(1)
     ))
     scaled    = image.divide(10000)
@@ -175,14 +200,30 @@ def build_composite(roi):
     s14 = ee.Date(str(today - datetime.timedelta(days=14)))
     s30 = ee.Date(str(today - datetime.timedelta(days=30)))
 
-    def col(start):
-        return (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+    s2_sr = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+               .filterBounds(roi)
+               .filterDate(s30, end_date))
+    s2_cloud = (ee.ImageCollection("COPERNICUS/S2_CLOUD_PROBABILITY")
                   .filterBounds(roi)
-                  .filterDate(start, end_date)
-                  .map(lambda img: mask_s2(img, roi))
-                  .select(BANDS))
+                  .filterDate(s30, end_date))
+
+    # SR and cloud-probability granules share system:index, so one join pairs
+    # them instead of a date-window query per image inside the mapped function
+    # (outer=True keeps SR images that have no probability granule)
+    joined = ee.ImageCollection(ee.Join.saveFirst("cloud", outer=True).apply(
+        primary   = s2_sr,
+        secondary = s2_cloud,
+        condition = ee.Filter.equals(leftField="system:index",
+                                     rightField="system:index")
+    ))
+
+    # Mask the 30-day collection once; the 7- and 14-day windows are date
+    # filters over the same mapped collection, so EE shares one masking graph
+    base = joined.map(mask_s2).select(BANDS)
+    c7   = base.filterDate(s7, end_date)
+    c14  = base.filterDate(s14, end_date)
 
-    composite = col(s7).median().unmask(col(s14).median()).unmask(col(s30).median())
+    composite = c7.median().unmask(c14.median()).unmask(base.median())
     return composite.unmask(0).clip(roi)
 
 
@@ -203,39 +244,52 @@ def start_region_export(composite, roi, export_name: str):
 
 
 # ── Poll all tasks until complete ─────────────────────────────────────────────
+POLL_INITIAL_S = 5      # first status check
+POLL_MAX_S     = 120    # backoff cap
+POLL_BACKOFF   = 1.7
+
+
 def wait_for_all_tasks(tasks: list, max_minutes=300) -> list:
     """
-    Poll all region export tasks every 60s until all complete or fail.
+    Poll all region export tasks with exponential backoff (5s, growing ×1.7
+    up to 120s) until all complete or fail. Short tasks are noticed within
+    seconds; long ones are polled at most every two minutes.
     Returns list of export_names that completed successfully.
     max_minutes=300 (5 hours) — full Ghana takes several hours per Rosemary.
     """
-    print(f"\n⏳ Polling {len(tasks)} region tasks every 60s (max {max_minutes} min)...")
+    print(f"\n⏳ Polling {len(tasks)} region tasks "
+          f"(every {POLL_INITIAL_S}s → {POLL_MAX_S}s, max {max_minutes} min)...")
     pending = {name: task for name, task in tasks}
     completed = []
     failed    = []
 
-    for minute in range(max_minutes):
-        time.sleep(60)
+    started  = time.time()
+    deadline = started + max_minutes * 60
+    delay    = POLL_INITIAL_S
+
+    while pending and time.time() < deadline:
+        time.sleep(max(0.0, min(delay, deadline - time.time())))
+        delay   = min(delay * POLL_BACKOFF, POLL_MAX_S)
+        minute  = int((time.time() - started) // 60)
         still_running = {}
 
         for name, task in pending.items():
-            state = task.status().get("state", "UNKNOWN")
+            status = task.status()   # one request per task per poll
+            state  = status.get("state", "UNKNOWN")
             if state == "COMPLETED":
-                print(f"   ✅ [{minute+1:03d}m] COMPLETED → {name}")
+                print(f"   ✅ [{minute:03d}m] COMPLETED → {name}")
                 completed.append(name)
             elif state in ("FAILED", "CANCELLED"):
-                err = task.status().get("error_message", "no details")
-                print(f"   ❌ [{minute+1:03d}m] {state} → {name}: {err}")
+                err = status.get("error_message", "no details")
+                print(f"   ❌ [{minute:03d}m] {state} → {name}: {err}")
                 failed.append(name)
             else:
                 still_running[name] = task
 
         pending = still_running
         if pending:
-            print(f"   ⏳ [{minute+1:03d}m] {len(pending)} still running: "
+            print(f"   ⏳ [{minute:03d}m] {len(pending)} still running: "
                   f"{', '.join(pending.keys())}")
-        else:
-            break
 
     if pending:
         print(f"\n⚠️  Timed out — {len(pending)} tasks still running: {list(pending.keys())}")
@@ -246,10 +300,62 @@ def wait_for_all_tasks(tasks: list, max_minutes=300) -> list:
     return completed
 
 
-# ── Download tiles for a completed export ─────────────────────────────────────
-def download_region_tiles(service, export_name: str, local_dir: str) -> bool:
-    from googleapiclient.http import MediaIoBaseDownload
+# ── Download one Drive file, resuming partial downloads ───────────────────────
+def download_file(service, f: dict, dest: str):
+    """
+    Fetch a Drive file in CHUNK_SIZE Range requests, appending to dest.
+    A partial dest left by an earlier attempt is resumed from its current
+    size, and a failed chunk is retried from the same offset, so a network
+    error costs at most one chunk rather than the whole tile.
+    """
+    size    = int(f["size"])
+    request = service.files().get_media(fileId=f["id"])
+    offset  = os.path.getsize(dest) if os.path.exists(dest) else 0
+
+    if offset > size:   # stale file of the same name — start over
+        offset = 0
+    if offset == size:
+        print(f"   ↩️  {f['name']} already complete — skipping")
+        return
+    if offset:
+        print(f"   ↩️  Resuming {f['name']} at {offset/1_048_576:.1f} MB")
+
+    with open(dest, "ab" if offset else "wb") as fh:
+        failures = 0
+        while offset < size:
+            end     = min(offset + CHUNK_SIZE, size) - 1
+            headers = {**request.headers, "Range": f"bytes={offset}-{end}"}
+            try:
+                resp, content = request.http.request(request.uri, method="GET", headers=headers)
+                # 200 means the Range was ignored — only usable from byte 0
+                if resp.status != 206 and not (resp.status == 200 and offset == 0):
+                    raise HttpError(resp, content, uri=request.uri)
+                # An empty body would never advance offset — retry it like any failed chunk
+                if not content:
+                    raise httplib2.HttpLib2Error("empty response body")
+            except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+                failures += 1
+                if failures > DOWNLOAD_RETRIES:
+                    raise
+                print(f"   ⚠️  {f['name']}: chunk at {offset/1_048_576:.1f} MB failed ({e}) "
+                      f"— retry {failures}/{DOWNLOAD_RETRIES}")
+                time.sleep(2 ** failures)
+                continue
+
+            fh.write(content)
+            offset  += len(content)
+            failures = 0
 
+
+# ── Download tiles for a completed export ─────────────────────────────────────
+def download_region_tiles(service, export_name: str, local_dir: str,
+                          creds_data: dict | None = None) -> bool:
+    """
+    Download every .tif tile of an export. With creds_data, up to
+    DOWNLOAD_WORKERS tiles are fetched concurrently, each worker thread
+    using its own Drive client; without it, tiles download one at a time
+    through `service`.
+    """
     results = service.files().list(
         q        = f"name contains '{export_name}' and trashed=false",
         fields   = "files(id,name,size)",
@@ -267,24 +373,19 @@ def download_region_tiles(service, export_name: str, local_dir: str) -> bool:
 
     os.makedirs(local_dir, exist_ok=True)
     total_mb = sum(int(f.get("size", 0)) for f in files) / 1_048_576
-    print(f"   Found {len(files)} tile(s) (~{total_mb:.1f} MB)")
+    workers  = min(DOWNLOAD_WORKERS, len(files)) if creds_data else 1
+    print(f"   Found {len(files)} tile(s) (~{total_mb:.1f} MB), {workers} parallel download(s)")
 
-    for i, f in enumerate(files, 1):
+    def download_one(f):
+        svc     = thread_drive_service(creds_data) if creds_data else service
         dest    = os.path.join(local_dir, f["name"])
         size_mb = int(f.get("size", 0)) / 1_048_576
-        print(f"   ⬇️  [{i}/{len(files)}] {f['name']} ({size_mb:.1f} MB)")
-        fh = io.FileIO(dest, "wb")
-        dl = MediaIoBaseDownload(
-            fh, service.files().get_media(fileId=f["id"]),
-            chunksize=50 * 1024 * 1024
-        )
-        done = False
-        while not done:
-            st, done = dl.next_chunk()
-            if st:
-                print(f"   {int(st.progress() * 100)}%", end="\r")
-        fh.close()
-        print(f"   ✅ Saved ({os.path.getsize(dest)/1_048_576:.1f} MB)")
+        print(f"   ⬇️  {f['name']} ({size_mb:.1f} MB)")
+        download_file(svc, f, dest)
+        print(f"   ✅ Saved {f['name']} ({os.path.getsize(dest)/1_048_576:.1f} MB)")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(download_one, files))
 
     return True
 
@@ -344,7 +445,7 @@ if __name__ == "__main__":
     for export_name in completed_exports:
         region_name = export_name.split("_")[1]  # extract from Ghana_REGION_Composite_...
         print(f"\n📂 {region_name}")
-        if not download_region_tiles(drive_svc, export_name, local_dir):
+        if not download_region_tiles(drive_svc, export_name, local_dir, creds_data):
             download_failures.append(export_name)
 
     if download_failures:
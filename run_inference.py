@@ -3,26 +3,39 @@
 FAMM Inference Runner — CI-Safe Wrapper
 """
 
+import functools
 import json
+import multiprocessing as mp
 import os
+import queue
 import sys
+import threading
+from contextlib import closing
 from datetime import datetime
+from itertools import count, islice, repeat
 from pathlib import Path
 
 import geopandas as gpd
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from shapely.geometry import Point
 from torchvision import models
 from tqdm import tqdm
 
 try:
     import rasterio
+    from rasterio.warp import transform as warp_transform
+    from rasterio.windows import Window
 except ImportError:
     print("❌ rasterio not installed. Run: pip install rasterio")
     sys.exit(1)
 
+try:
+    import orjson
+except ImportError:   # stdlib json fallback — same output, just slower
+    orjson = None
+
 # ── Paths ─────────────────────────────────────────────────────────────────────
 CHECKPOINT_PATH = "models/mobilenetv3_best.pth"
 INPUT_DIR       = "data/tif_input"
@@ -30,23 +43,40 @@ OUTPUT_PATH     = "asm_monitoring_results.geojson"   # validator picks this up
 ADM1_PATH       = "deployment/geoBoundaries-GHA-ADM1.geojson"
 ADM2_PATH       = "deployment/geoBoundaries-GHA-ADM2.geojson"
 
+# Output coordinates are lon/lat; detections and boundaries are both brought into it
+DETECTION_CRS = "EPSG:4326"
+
 # ── Model settings (must match Rosemary's training config) ────────────────────
 MODEL_SIZE = 224
 STRIDE     = 224
 NUM_BANDS  = 10
 THRESHOLD  = 0.3   # Rosemary's inference threshold — validator re-maps alert levels
+BATCH_SIZE = 32    # patches per forward pass
+PREFETCH   = 2     # batches read ahead of the model by the reader thread
+MAX_WORKERS = 4    # tile-level worker processes
+
+# bfloat16 autocast only pays off on CPUs with native BF16 (AVX-512 BF16 / AMX);
+# elsewhere it is emulated and slower than fp32, so it is opt-in
+USE_BF16 = os.environ.get("FAMM_BF16", "false").lower() == "true"
 
 # ── Device: always CPU in CI (no MPS/CUDA on GitHub runners) ─────────────────
 device = torch.device("cpu")
 print(f"🖥️  Running on: {device}")
 
+# Leave one core for the rasterio reader thread
+torch.set_num_threads(max(1, (os.cpu_count() or 2) - 1))
+
 
 # ── Load model ────────────────────────────────────────────────────────────────
-def load_model(checkpoint_path: str):
+def require_checkpoint(checkpoint_path: str):
     if not Path(checkpoint_path).exists():
         print(f"❌ Model checkpoint not found: {checkpoint_path}")
         sys.exit(1)
 
+
+def load_model(checkpoint_path: str):
+    require_checkpoint(checkpoint_path)
+
     model = models.mobilenet_v3_large(weights=None)
     # Match Rosemary's 10-band first conv modification
     model.features[0][0] = nn.Conv2d(
@@ -57,92 +87,284 @@ def load_model(checkpoint_path: str):
     checkpoint = torch.load(checkpoint_path, map_location=device)
     model.load_state_dict(checkpoint["model_state_dict"])
     model.to(device).eval()
-    print(f"✅ Model loaded from {checkpoint_path}")
+
+    # channels_last keeps the depthwise convs on oneDNN's vectorised NHWC kernels;
+    # trace + freeze folds BatchNorm and weights into a static TorchScript graph
+    model   = model.to(memory_format=torch.channels_last)
+    example = torch.randn(BATCH_SIZE, NUM_BANDS, MODEL_SIZE, MODEL_SIZE).to(
+        device, memory_format=torch.channels_last
+    )
+    # (the trace re-run check spuriously fails on autocast's inserted casts)
+    with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=USE_BF16):
+        model = torch.jit.freeze(torch.jit.trace(model, example, check_trace=not USE_BF16))
+
+    print(f"✅ Model loaded from {checkpoint_path} "
+          f"(TorchScript, channels_last, {'bf16' if USE_BF16 else 'fp32'})")
     return model
 
 
 # ── Boundary files ────────────────────────────────────────────────────────────
-ghana_regions   = gpd.read_file(ADM1_PATH) if Path(ADM1_PATH).exists() else None
-ghana_districts = gpd.read_file(ADM2_PATH) if Path(ADM2_PATH).exists() else None
-
-if ghana_regions is None:
-    print(f"⚠️  ADM1 boundary file not found: {ADM1_PATH}  — region will be 'Unknown'")
-if ghana_districts is None:
-    print(f"⚠️  ADM2 boundary file not found: {ADM2_PATH} — district will be 'Unknown'")
+gpd.options.io_engine = "pyogrio"
 
 
-def get_location_details(longitude: float, latitude: float) -> tuple[str, str]:
-    """Spatial join to get district (ADM2) and region (ADM1) for a point."""
-    point    = Point(longitude, latitude)
-    district = "Unknown"
-    region   = "Unknown"
+def _read_boundary(path: str):
+    if not Path(path).exists():
+        return None
+    layer = gpd.read_file(path, columns=["shapeName"])
+    if layer.crs is None:   # GeoJSON without a crs member is lon/lat by spec
+        return layer.set_crs(DETECTION_CRS)
+    return layer.to_crs(DETECTION_CRS)
 
-    if ghana_regions is not None:
-        match = ghana_regions[ghana_regions.contains(point)]
-        if not match.empty:
-            region = match.iloc[0].get("shapeName", "Unknown")
 
-    if ghana_districts is not None:
-        match = ghana_districts[ghana_districts.contains(point)]
-        if not match.empty:
-            district = match.iloc[0].get("shapeName", "Unknown")
+@functools.lru_cache(maxsize=1)
+def get_boundaries():
+    """
+    (regions, districts) GeoDataFrames in DETECTION_CRS — read on first use,
+    keeping only shapeName + geometry. Either is None when its file is missing.
+    """
+    regions   = _read_boundary(ADM1_PATH)
+    districts = _read_boundary(ADM2_PATH)
 
-    return district, region
+    if regions is None:
+        print(f"⚠️  ADM1 boundary file not found: {ADM1_PATH}  — region will be 'Unknown'")
+    if districts is None:
+        print(f"⚠️  ADM2 boundary file not found: {ADM2_PATH} — district will be 'Unknown'")
+    return regions, districts
 
 
 # ── Inference (mirrors Rosemary's process_shard exactly) ─────────────────────
-def process_shard(model, tif_path: str) -> list[dict]:
-    features = []
-    tile_id  = os.path.basename(tif_path)
-    area_ha  = (MODEL_SIZE * 10 * MODEL_SIZE * 10) / 10000.0
+def predict_batch(model, batch: torch.Tensor) -> np.ndarray:
+    """Return the ASM (class 1) probability for every patch in the batch."""
+    batch = batch.to(device, memory_format=torch.channels_last)
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=USE_BF16):
+        output = model(batch)
+        return F.softmax(output.float(), dim=1)[:, 1].cpu().numpy()
+
+
+def prefetch(iterable, maxsize: int = PREFETCH):
+    """
+    Drain iterable in a background thread, yielding its items through a
+    bounded queue so reading overlaps with the caller's work.
+    Exceptions raised by the producer are re-raised in the caller.
+    """
+    q    = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                q.put(item)
+        except Exception as e:
+            q.put(e)
+        q.put(done)
+
+    reader = threading.Thread(target=produce, daemon=True)
+    reader.start()
+    try:
+        while (item := q.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Unblock a pending put and wait, so the reader never outlives the dataset
+        stop.set()
+        while reader.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def read_batches(src, tif_path: str):
+    """Yield (coords, batch) for each run of up to BATCH_SIZE patch windows in src."""
+    H, W  = src.height, src.width
+    bands = list(range(1, NUM_BANDS + 1))
+
+    # Windows are read lazily, one batch at a time, so peak memory is
+    # O(BATCH_SIZE × patch) rather than the whole GeoTIFF
+    offsets = (
+        (i, j)
+        for i in range(0, H - MODEL_SIZE + 1, STRIDE)
+        for j in range(0, W - MODEL_SIZE + 1, STRIDE)
+    )
+    # The consumer holds one batch, the queue up to PREFETCH more, and the
+    # reader fills one — so a ring of PREFETCH + 2 buffers is never overwritten in use.
+    # rasterio reads straight into each tensor's numpy view: no per-patch allocation.
+    ring = [
+        torch.empty((BATCH_SIZE, NUM_BANDS, MODEL_SIZE, MODEL_SIZE), dtype=torch.float32)
+        for _ in range(PREFETCH + 2)
+    ]
+    ring_np = [t.numpy() for t in ring]
+
+    # Integer bands hold raw Sentinel-2 DN and are scaled to reflectance; float
+    # bands are already reflectance (the EE export divides by 10000 in mask_s2)
+    rescale = np.issubdtype(np.dtype(src.dtypes[0]), np.integer)
+
+    for slot in count():
+        coords = list(islice(offsets, BATCH_SIZE))
+        if not coords:
+            return
+        n        = len(coords)
+        batch_np = ring_np[slot % len(ring)]
+        try:
+            for k, (i, j) in enumerate(coords):
+                src.read(bands, window=Window(j, i, MODEL_SIZE, MODEL_SIZE), out=batch_np[k])
+        except Exception as e:
+            print(f"⚠️  Read failed in {tif_path} at window {coords[k]}: {e} — skipping rest of tile")
+            return
+
+        batch = ring[slot % len(ring)][:n]
+        if rescale:
+            batch.div_(10000.0)
+
+        yield coords, batch
+
+
+def process_shard(model, tif_path: str) -> list[tuple[float, float, float, str]]:
+    """Return (longitude, latitude, confidence, tile_id) in DETECTION_CRS for every patch above THRESHOLD."""
+    detections = []
+    tile_id    = os.path.basename(tif_path)
 
     try:
-        with rasterio.open(tif_path) as src:
-            image     = src.read()
-            transform = src.transform
-            _, H, W   = image.shape
+        src = rasterio.open(tif_path, sharing=False)
     except Exception as e:
         print(f"⚠️  Could not read {tif_path}: {e} — skipping")
-        return features
-
-    for i in range(0, H - MODEL_SIZE + 1, STRIDE):
-        for j in range(0, W - MODEL_SIZE + 1, STRIDE):
-            patch = image[:, i:i + MODEL_SIZE, j:j + MODEL_SIZE]
-            patch_tensor = torch.tensor(patch, dtype=torch.float32)
-
-            if patch_tensor.max() > 1:
-                patch_tensor /= 10000.0
-
-            patch_tensor = patch_tensor.unsqueeze(0).to(device)
-            with torch.no_grad():
-                output     = model(patch_tensor)
-                probs      = F.softmax(output, dim=1)
-                confidence = probs[0, 1].item()
-
-            if confidence >= THRESHOLD:
-                # Rosemary's alert thresholds (validator will re-map to dashboard thresholds)
-                alert = "HIGH" if confidence > 0.8 else "MEDIUM" if confidence > 0.5 else "LOW"
-                longitude, latitude = transform * (j + (MODEL_SIZE // 2), i + (MODEL_SIZE // 2))
-                district, region    = get_location_details(longitude, latitude)
-
-                features.append({
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [float(longitude), float(latitude)]
-                    },
-                    "properties": {
-                        "confidence":  round(float(confidence), 4),
-                        "district":    district,
-                        "region":      region,
-                        "date":        datetime.now().strftime("%Y-%m-%d"),
-                        "area_ha":     round(area_ha, 2),
-                        "tile_id":     tile_id,
-                        "alert_level": alert
-                    }
-                })
-
-    return features
+        return detections
+
+    with src, closing(prefetch(read_batches(src, tif_path))) as batches:
+        transform = src.transform
+        # Tiles not exported in lon/lat get their patch centres reprojected
+        reproject = src.crs is not None and src.crs != DETECTION_CRS
+
+        for coords, batch in batches:
+            # build_composite's unmask(0) leaves outside-ROI / fully masked patches
+            # exactly zero — a max-reduction is far cheaper than a forward pass
+            keep = np.flatnonzero(batch.flatten(1).amax(dim=1).numpy() > 0)
+            if len(keep) == 0:
+                continue
+            if len(keep) < len(coords):
+                batch = batch[torch.from_numpy(keep)]
+
+            probs = predict_batch(model, batch)
+
+            hits = np.flatnonzero(probs >= THRESHOLD)
+            if len(hits) == 0:
+                continue
+
+            # Patch centres → lon/lat for all hits at once (same a·x + b·y + c
+            # as transform * (x, y)), then one bulk numpy → Python conversion
+            ij   = np.asarray(coords)[keep[hits]]
+            cx   = ij[:, 1] + MODEL_SIZE // 2
+            cy   = ij[:, 0] + MODEL_SIZE // 2
+            lons = transform.a * cx + transform.b * cy + transform.c
+            lats = transform.d * cx + transform.e * cy + transform.f
+            if reproject:
+                lons, lats = map(np.asarray, warp_transform(src.crs, DETECTION_CRS, lons, lats))
+            detections.extend(zip(
+                lons.tolist(), lats.tolist(), probs[hits].tolist(), repeat(tile_id)
+            ))
+
+    return detections
+
+
+# ── Tile-parallel workers ─────────────────────────────────────────────────────
+_worker_model = None
+
+
+def _init_worker(checkpoint_path: str):
+    """Pool initializer — one model per forked worker, single-threaded BLAS."""
+    global _worker_model
+    torch.set_num_threads(1)
+    _worker_model = load_model(checkpoint_path)
+
+
+def _process_tile(tif_path: str):
+    return tif_path, process_shard(_worker_model, tif_path)
+
+
+def _join_names(points: gpd.GeoDataFrame, boundaries) -> list[str]:
+    """shapeName of the boundary polygon containing each point, or 'Unknown'."""
+    if boundaries is None:
+        return ["Unknown"] * len(points)
+    joined = gpd.sjoin(
+        points[["geometry"]], boundaries[["shapeName", "geometry"]],
+        how="left", predicate="within"
+    )
+    # A point on overlapping polygons matches several rows — lowest row wins
+    joined = joined.sort_values("index_right", kind="stable")
+    joined = joined[~joined.index.duplicated(keep="first")].reindex(points.index)
+    return joined["shapeName"].fillna("Unknown").tolist()
+
+
+def iter_features(detections: list[tuple[float, float, float, str]]):
+    """Attach district/region to all detections with one spatial join each, then yield GeoJSON features."""
+    if not detections:
+        return
+
+    ghana_regions, ghana_districts = get_boundaries()
+    lons, lats, confs, tile_ids    = zip(*detections)
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lons, lats), crs=DETECTION_CRS)
+
+    districts = _join_names(points, ghana_districts)
+    regions   = _join_names(points, ghana_regions)
+    area_ha   = round((MODEL_SIZE * 10 * MODEL_SIZE * 10) / 10000.0, 2)
+    date      = datetime.now().strftime("%Y-%m-%d")
+
+    # Rosemary's alert thresholds (validator will re-map to dashboard thresholds)
+    conf_arr = np.asarray(confs)
+    alerts   = np.where(conf_arr > 0.8, "HIGH",
+                        np.where(conf_arr > 0.5, "MEDIUM", "LOW")).tolist()
+
+    for longitude, latitude, confidence, tile_id, district, region, alert in zip(
+        lons, lats, confs, tile_ids, districts, regions, alerts
+    ):
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [longitude, latitude]
+            },
+            "properties": {
+                "confidence":  round(confidence, 4),
+                "district":    district,
+                "region":      region,
+                "date":        date,
+                "area_ha":     area_ha,
+                "tile_id":     tile_id,
+                "alert_level": alert
+            }
+        }
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def write_geojson(path: str, features, pretty: bool = False):
+    """
+    Write a FeatureCollection from an iterable of features. The compact form
+    is streamed one feature at a time, so the full collection is never held
+    in memory; pretty (indent=2, for human inspection) materialises it.
+    """
+    if pretty:
+        output = {"type": "FeatureCollection", "features": list(features)}
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2)
+            f.write("\n")
+        return
+
+    with open(path, "wb") as f:
+        f.write(b'{"type":"FeatureCollection","features":[')
+        for n, feature in enumerate(features):
+            if n:
+                f.write(b",")
+            f.write(_dumps(feature))
+        f.write(b"]}\n")
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────
@@ -162,17 +384,31 @@ if __name__ == "__main__":
         sys.exit(0)
 
     print(f"\n📂 Found {len(tif_files)} .tif file(s) to process")
-    model        = load_model(CHECKPOINT_PATH)
-    all_features = []
-
-    for tif_path in tqdm(tif_files, desc="Processing tiles"):
-        all_features.extend(process_shard(model, str(tif_path)))
-
-    print(f"\n🔍 Detections above threshold ({THRESHOLD}): {len(all_features)}")
-
-    output = {"type": "FeatureCollection", "features": all_features}
-    with open(OUTPUT_PATH, "w") as f:
-        json.dump(output, f, indent=2)
+    require_checkpoint(CHECKPOINT_PATH)
+    tif_paths = [str(p) for p in tif_files]
+    workers   = min(MAX_WORKERS, len(tif_paths), os.cpu_count() or 1)
+    by_tile   = {}
+
+    if workers > 1:
+        print(f"   Using {workers} worker processes")
+        with mp.Pool(processes=workers, initializer=_init_worker,
+                     initargs=(CHECKPOINT_PATH,)) as pool:
+            for tif_path, tile_detections in tqdm(
+                pool.imap_unordered(_process_tile, tif_paths),
+                total=len(tif_paths), desc="Processing tiles"
+            ):
+                by_tile[tif_path] = tile_detections
+    else:
+        model = load_model(CHECKPOINT_PATH)
+        for tif_path in tqdm(tif_paths, desc="Processing tiles"):
+            by_tile[tif_path] = process_shard(model, tif_path)
+
+    # Completion order varies between runs — keep the output in tile order
+    detections = [d for tif_path in tif_paths for d in by_tile[tif_path]]
+
+    print(f"\n🔍 Detections above threshold ({THRESHOLD}): {len(detections)}")
+
+    write_geojson(OUTPUT_PATH, iter_features(detections), pretty="--pretty" in sys.argv)
 
     print(f"✅ Raw results saved to: {OUTPUT_PATH}")
     print("   → Next: run validate_rosemary_geojson.py to clean & move to dashboard path")
@@ -4,14 +4,22 @@ Main Streamlit application for visualizing ASM detection results
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import folium
-from streamlit_folium import st_folium
-import geopandas as gpd
+import pydeck as pdk
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import copy
+import hashlib
 import json
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Page configuration
 st.set_page_config(
     page_title="FAMM - ASM Monitor",
@@ -86,6 +94,7 @@ TRANSLATIONS = {
         'download_filtered': 'Download filtered data',
         'asm_site_detection': 'ASM Site Detection',
         'detected': 'Detected',
+        'fast_map_note': 'Showing {count:,} detections on a fast map: hover a point for its details. Satellite view and click popups return when the filters narrow it to {limit:,} or fewer.',
     },
     'tw': {  # Twi - COMPLETE TRANSLATION
         'title': 'FAMM - ASM Hwɛsoɔ',
@@ -120,15 +129,32 @@ TRANSLATIONS = {
         'download_filtered': 'Download data a wɔapaw',
         'asm_site_detection': 'Galamsey Beaeɛ',
         'detected': 'Yɛahunu',
+        'fast_map_note': 'Yɛrekyerɛ beaeɛ {count:,} wɔ mepɔ ntɛmntɛm so: fa mouse to beaeɛ bi so na hu ne nsɛm. Satellite mfonini ne popups bɛsan aba sɛ wopaw filter na ɛso yɛ {limit:,} anaa nea ɛsua.',
     }
 }
 
+def file_version(filepath):
+    """Modification time of filepath (None if missing), used as a cache key"""
+    path = Path(filepath)
+    return path.stat().st_mtime_ns if path.exists() else None
+
+@st.cache_data(show_spinner=False)
+def _read_geojson(filepath, mtime_ns):
+    """Parse GeoJSON once per file version (mtime_ns is part of the cache key)"""
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
 def load_geojson_data(filepath):
     """Load GeoJSON data from file or return sample data"""
     try:
-        if Path(filepath).exists():
-            with open(filepath, 'r') as f:
-                return json.load(f)
+        mtime_ns = file_version(filepath)
+        if mtime_ns is not None:
+            # Every widget interaction reruns the script; serve the parsed
+            # dict from cache until the weekly update rewrites the file
+            return _read_geojson(filepath, mtime_ns)
         else:
             # Return sample data structure
             return {
@@ -139,178 +165,315 @@ def load_geojson_data(filepath):
         st.error(f"Error loading data: {e}")
         return {"type": "FeatureCollection", "features": []}
 
-def filter_geojson_by_region(geojson_data, region):
-    """Filter GeoJSON features by region"""
-    if region == 'All Regions' or not region:
-        return geojson_data
-    
-    filtered_features = [
-        f for f in geojson_data.get('features', [])
-        if f.get('properties', {}).get('region') == region
-    ]
-    
-    return {
-        "type": "FeatureCollection",
-        "features": filtered_features
-    }
+# Map marker bins (HIGH >= 0.85, MEDIUM >= 0.7) and headline metric bins
+# (high risk >= 0.80, medium >= 0.5); bins are closed on the left
+LEVELS         = ['LOW', 'MEDIUM', 'HIGH']
+MAP_BINS       = [-np.inf, 0.7, 0.85, np.inf]
+RISK_BINS      = [-np.inf, 0.5, 0.80, np.inf]
+ALERT_COLORS   = {'LOW': 'yellow', 'MEDIUM': 'orange', 'HIGH': 'red'}
+ALERT_RGB      = {'yellow': [255, 255, 0], 'orange': [255, 165, 0], 'red': [255, 0, 0]}
+ALERT_LABELS   = {
+    'en': {'LOW': 'LOW', 'MEDIUM': 'MEDIUM', 'HIGH': 'HIGH'},
+    'tw': {'LOW': 'KETEWA', 'MEDIUM': 'MFINIMFINI', 'HIGH': 'KƐSEƐ'},
+}
 
-def filter_geojson_by_district(geojson_data, district):
-    """Filter GeoJSON features by district"""
-    if district == 'All Districts' or not district:
-        return geojson_data
-    
-    filtered_features = [
-        f for f in geojson_data.get('features', [])
-        if f.get('properties', {}).get('district') == district
-    ]
-    
-    return {
-        "type": "FeatureCollection",
-        "features": filtered_features
-    }
+# Above this many markers the map is drawn with deck.gl (WebGL) instead of
+# Folium, which creates one SVG element per marker in the browser. The deck
+# map has hover tooltips instead of click popups and no satellite layer, so a
+# caption tells the user when it is in use.
+DECK_MIN_POINTS = 2000
 
-def filter_geojson_by_date(geojson_data, start_date, end_date):
-    """Filter GeoJSON features by date range"""
-    filtered_features = []
-    
-    for f in geojson_data.get('features', []):
-        props = f.get('properties', {})
-        if 'date' in props:
-            try:
-                feature_date = datetime.strptime(props['date'], '%Y-%m-%d').date()
-                if start_date <= feature_date <= end_date:
-                    filtered_features.append(f)
-            except:
-                # If date parsing fails, include the feature
-                filtered_features.append(f)
-        else:
-            filtered_features.append(f)
-    
-    return {
-        "type": "FeatureCollection",
-        "features": filtered_features
-    }
+# Download payloads are cached per filter state and shared by all sessions;
+# bound how many are held and for how long (seconds)
+DOWNLOAD_CACHE_ENTRIES = 32
+DOWNLOAD_CACHE_TTL     = 3600
 
-def create_map(geojson_data, language='en', center=[7.9465, -1.0232], zoom=8):
-    """Create a Folium map with ASM detection markers"""
-    
-    t = TRANSLATIONS[language]
-    
-    # Initialize map centered on Ghana (Western/Ashanti region)
-    m = folium.Map(
-        location=center,
-        zoom_start=zoom,
-        tiles='OpenStreetMap'
-    )
-    
-    # Add satellite imagery layer
-    folium.TileLayer(
-        tiles='https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
-        attr='Google',
-        name='Satellite',
-        overlay=False,
-        control=True
-    ).add_to(m)
-    
-    # Add detection markers
-    if geojson_data and 'features' in geojson_data:
-        for feature in geojson_data['features']:
-            props = feature.get('properties', {})
-            coords = feature.get('geometry', {}).get('coordinates', [0, 0])
-            
-            # Determine alert level based on confidence
-            confidence = props.get('confidence', 0)
-            if confidence >= 0.85:
-                color = 'red'
-                alert = 'HIGH' if language == 'en' else 'KƐSEƐ'
-            elif confidence >= 0.7:
-                color = 'orange'
-                alert = 'MEDIUM' if language == 'en' else 'MFINIMFINI'
-            else:
-                color = 'yellow'
-                alert = 'LOW' if language == 'en' else 'KETEWA'
-            
-            # Create popup content with coordinates
-            popup_html = f"""
+# Properties the dashboard shows, filters on or exports; anything else is
+# dropped at load. Missing ones are added as empty columns.
+KEEP_PROPERTIES = ['confidence', 'district', 'region', 'date', 'area_ha', 'tile_id', 'alert_level']
+FRAME_COLUMNS   = [f'properties.{name}' for name in KEEP_PROPERTIES] + ['lon', 'lat']
+
+# Detections table: frame column -> (translation key, value when missing)
+TABLE_COLUMNS = {
+    'properties.date':        ('date', 'N/A'),
+    'properties.district':    ('district', 'Unknown'),
+    'properties.region':      ('region', 'Unknown'),
+    'lat':                    ('latitude', 0.0),
+    'lon':                    ('longitude', 0.0),
+    'properties.confidence':  ('confidence', 0.0),
+    'properties.area_ha':     ('area_ha', 0.0),
+    'properties.alert_level': ('alert_level', 'LOW'),
+}
+
+def source_digest(filepath):
+    """blake2b of the GeoJSON's bytes, as recorded by the validator in its Parquet copy"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+def read_parquet_sidecar(filepath):
+    """Columnar copy of the GeoJSON written by the validator, or None if missing or stale"""
+    parquet_path = Path(filepath).with_suffix('.parquet')
+    if not parquet_path.exists() or not Path(filepath).exists():
+        return None
+    try:
+        df = pd.read_parquet(parquet_path)
+    except Exception:
+        return None
+    # The validator records the digest of the GeoJSON it was written from, so
+    # any edit to the GeoJSON since — even one keeping its size — is noticed
+    if df.attrs.get('source_digest') != source_digest(filepath):
+        return None
+    return df.rename(columns=lambda c: c if c in ('lon', 'lat') else f'properties.{c}')
+
+@st.cache_data(show_spinner=False)
+def load_detections_frame(filepath, version):
+    """Flatten detections into a DataFrame once per file version"""
+    df = read_parquet_sidecar(filepath)
+    if df is None:
+        df = pd.json_normalize(load_geojson_data(filepath).get('features', []))
+        # GeoJSON is [lon, lat]; features without coordinates fall back to (0, 0)
+        coords = df['geometry.coordinates'] if 'geometry.coordinates' in df else []
+        lonlat = np.array([c[:2] if isinstance(c, list) else (0, 0)
+                           for c in coords], dtype=float).reshape(-1, 2)
+        df['lon'], df['lat'] = lonlat[:, 0], lonlat[:, 1]
+    df = df.reindex(columns=FRAME_COLUMNS)
+    df['date_parsed'] = pd.to_datetime(df['properties.date'], format='%Y-%m-%d', errors='coerce')
+    confidence = df['properties.confidence'].fillna(0)
+    df['alert'] = pd.cut(confidence, MAP_BINS, right=False, labels=LEVELS)
+    df['color'] = df['alert'].map(ALERT_COLORS)
+    df['risk']  = pd.cut(confidence, RISK_BINS, right=False, labels=LEVELS)
+    return df
+
+def frame_to_geojson(df):
+    """Point FeatureCollection rebuilt from the frame's properties.* columns"""
+    columns = [c for c in df.columns if c.startswith('properties.')]
+    names = [c[len('properties.'):] for c in columns]
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {k: v for k, v in zip(names, values) if pd.notna(v)},
+        }
+        for lon, lat, values in zip(df['lon'].tolist(), df['lat'].tolist(),
+                                    df[columns].itertuples(index=False))
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+# Popup markup: labels are filled per language once at import ({label}),
+# values per marker ({{value}})
+POPUP_TEMPLATE = """
                 <div style="width: 250px; font-family: Arial, sans-serif;">
-                    <h4 style="margin-bottom: 10px; color: #1f77b4;">{t['asm_site_detection']}</h4>
+                    <h4 style="margin-bottom: 10px; color: #1f77b4;">{asm_site_detection}</h4>
                     <table style="width: 100%; border-collapse: collapse;">
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['alert_level']}:</td>
-                            <td style="padding: 5px; color: {color}; font-weight: bold;">{alert}</td>
+                            <td style="padding: 5px; font-weight: bold;">{alert_level}:</td>
+                            <td style="padding: 5px; color: {{color}}; font-weight: bold;">{{alert}}</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['confidence']}:</td>
-                            <td style="padding: 5px;">{confidence:.2%}</td>
+                            <td style="padding: 5px; font-weight: bold;">{confidence}:</td>
+                            <td style="padding: 5px;">{{confidence:.2%}}</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['district']}:</td>
-                            <td style="padding: 5px;">{props.get('district', 'Unknown')}</td>
+                            <td style="padding: 5px; font-weight: bold;">{district}:</td>
+                            <td style="padding: 5px;">{{district}}</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['region']}:</td>
-                            <td style="padding: 5px;">{props.get('region', 'Unknown')}</td>
+                            <td style="padding: 5px; font-weight: bold;">{region}:</td>
+                            <td style="padding: 5px;">{{region}}</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['detected']}:</td>
-                            <td style="padding: 5px;">{props.get('date', 'Unknown')}</td>
+                            <td style="padding: 5px; font-weight: bold;">{detected}:</td>
+                            <td style="padding: 5px;">{{date}}</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['area']}:</td>
-                            <td style="padding: 5px;">{props.get('area_ha', 'N/A')} ha</td>
+                            <td style="padding: 5px; font-weight: bold;">{area}:</td>
+                            <td style="padding: 5px;">{{area_ha}} ha</td>
                         </tr>
                         <tr style="border-bottom: 1px solid #ddd;">
-                            <td style="padding: 5px; font-weight: bold;">{t['latitude']}:</td>
-                            <td style="padding: 5px;">{coords[1]:.6f}°</td>
+                            <td style="padding: 5px; font-weight: bold;">{latitude}:</td>
+                            <td style="padding: 5px;">{{lat:.6f}}°</td>
                         </tr>
                         <tr>
-                            <td style="padding: 5px; font-weight: bold;">{t['longitude']}:</td>
-                            <td style="padding: 5px;">{coords[0]:.6f}°</td>
+                            <td style="padding: 5px; font-weight: bold;">{longitude}:</td>
+                            <td style="padding: 5px;">{{lon:.6f}}°</td>
                         </tr>
                     </table>
                 </div>
             """
-            
-            folium.CircleMarker(
-                location=[coords[1], coords[0]],  # Note: GeoJSON is [lon, lat]
-                radius=8,
-                popup=folium.Popup(popup_html, max_width=300),
-                color=color,
-                fillColor=color,
-                fillOpacity=0.6,
-                weight=2
-            ).add_to(m)
+
+POPUP_TEMPLATES = {lang: POPUP_TEMPLATE.format_map(t) for lang, t in TRANSLATIONS.items()}
+
+def marker_frame(df, language, compact=False):
+    """Position, colour and popup HTML for every detection marker"""
+    # Popup values with the same fallbacks as the GeoJSON properties
+    values = pd.DataFrame({
+        'confidence': df['properties.confidence'].fillna(0),
+        'district':   df['properties.district'].fillna('Unknown'),
+        'region':     df['properties.region'].fillna('Unknown'),
+        'date':       df['properties.date'].fillna('Unknown'),
+        'area_ha':    df['properties.area_ha'].astype(object).fillna('N/A'),
+        'lat':        df['lat'],
+        'lon':        df['lon'],
+        'color':      df['color'],
+        'alert':      df['alert'].map(ALERT_LABELS[language]),
+    })
+    popup_template = POPUP_TEMPLATES[language]
+    if compact:
+        # Markup indentation only adds payload; collapse it
+        popup_template = ' '.join(popup_template.split())
+    values['popup_html'] = [popup_template.format_map(v) for v in values.to_dict('records')]
+    return values
+
+@st.cache_resource(show_spinner=False)
+def _base_map(center, zoom):
+    """Map with the base tile layers, shared by all sessions (copy before use)"""
+    # Initialize map centered on Ghana (Western/Ashanti region)
+    m = folium.Map(
+        location=list(center),
+        zoom_start=zoom,
+        tiles='OpenStreetMap'
+    )
+    
+    # Add satellite imagery layer
+    folium.TileLayer(
+        tiles='https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
+        attr='Google',
+        name='Satellite',
+        overlay=False,
+        control=True
+    ).add_to(m)
+    
+    return m
+
+def create_map(df, language='en', center=[7.9465, -1.0232], zoom=8):
+    """Create a Folium map with ASM detection markers"""
+    
+    # Deep-copying the cached base map is much cheaper than rebuilding it,
+    # and keeps markers out of the instance other sessions share
+    m = copy.deepcopy(_base_map(tuple(center), zoom))
+    
+    # Add detection markers as one GeoJSON layer rather than one
+    # CircleMarker per feature, so the points are serialized once
+    values = marker_frame(df, language, compact=True)
+    markers = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                # Without an id folium keys the style switch on popup_html,
+                # embedding every popup a second time
+                "id": str(i),
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"popup_html": popup_html, "color": color},
+            }
+            for i, (lon, lat, popup_html, color) in enumerate(zip(
+                values['lon'], values['lat'], values['popup_html'], values['color']))
+        ]
+    }
+    
+    # GeoJsonPopup cannot be bound to an empty layer
+    if markers['features']:
+        folium.GeoJson(
+            markers,
+            name='Detections',
+            control=False,
+            marker=folium.CircleMarker(radius=8, fill_opacity=0.6, weight=2),
+            style_function=lambda feature: {
+                'color': feature['properties']['color'],
+                'fillColor': feature['properties']['color'],
+            },
+            popup=folium.GeoJsonPopup(fields=['popup_html'], labels=False,
+                                      localize=False, max_width=300),
+        ).add_to(m)
     
     # Add layer control
     folium.LayerControl().add_to(m)
     
     return m
 
-def get_unique_regions_and_districts(geojson_data):
-    """Extract unique regions and districts from actual data"""
-    regions = set()
-    districts = set()
-    
-    for feature in geojson_data.get('features', []):
-        props = feature.get('properties', {})
-        if 'region' in props and props['region']:
-            regions.add(props['region'])
-        if 'district' in props and props['district']:
-            districts.add(props['district'])
+def create_deck(df, language='en', center=[7.9465, -1.0232], zoom=7):
+    """Create a deck.gl scatterplot of ASM detections for large result sets"""
+    values = marker_frame(df, language, compact=True)
+    # Same colours as the Folium markers at fill opacity 0.6
+    values['fill'] = [ALERT_RGB[c] + [153] for c in values['color']]
+    values['line'] = [ALERT_RGB[c] + [255] for c in values['color']]
+    
+    layer = pdk.Layer(
+        'ScatterplotLayer',
+        values[['lon', 'lat', 'fill', 'line', 'popup_html']],
+        get_position=['lon', 'lat'],
+        get_fill_color='fill',
+        get_line_color='line',
+        get_radius=8,
+        radius_units=pdk.types.String('pixels'),
+        stroked=True,
+        line_width_min_pixels=2,
+        pickable=True,
+    )
     
-    # Sort alphabetically for consistent display
-    regions = sorted(list(regions))
-    districts = sorted(list(districts))
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom),
+        map_style='light',
+        tooltip={'html': '{popup_html}', 'style': {'backgroundColor': 'white', 'color': 'black'}},
+    )
+
+def detections_to_display(df, t):
+    """Detections table with translated headers, selected from the frame's columns"""
+    return (df[list(TABLE_COLUMNS)]
+            .fillna({column: default for column, (_, default) in TABLE_COLUMNS.items()})
+            .rename(columns={column: t[key] for column, (key, _) in TABLE_COLUMNS.items()})
+            # Arrow-backed columns hand straight to st.dataframe's Arrow serialization
+            .convert_dtypes(dtype_backend='pyarrow'))
+
+@st.cache_data(show_spinner=False, max_entries=DOWNLOAD_CACHE_ENTRIES,
+               ttl=DOWNLOAD_CACHE_TTL)
+def geojson_download_bytes(_df, filter_key):
+    """Serialize the filtered detections as GeoJSON once per filter state"""
+    geojson_data = frame_to_geojson(_df)
+    if orjson is not None:
+        return orjson.dumps(geojson_data, option=orjson.OPT_INDENT_2)
+    return json.dumps(geojson_data, indent=2).encode()
+
+@st.cache_data(show_spinner=False, max_entries=DOWNLOAD_CACHE_ENTRIES,
+               ttl=DOWNLOAD_CACHE_TTL)
+def csv_download_bytes(_df, filter_key, language):
+    """Serialize the detections table once per filter state and language"""
+    return _df.to_csv(index=False).encode()
+
+def carried_index(key, options, language):
+    """
+    Default index for the translated-label selectbox `key`, so its choice
+    carries over a language switch (the widget is re-created then, because
+    its label changes). The default only moves when the language does;
+    changing it on other reruns would re-create the widget mid-selection.
+    """
+    state = st.session_state
+    if state.get(f'{key}_lang') != language:
+        state[f'{key}_lang']    = language
+        state[f'{key}_default'] = state.get(f'{key}_choice')
+    default = state[f'{key}_default']
+    return options.index(default) if default in options else 0
+
+def get_unique_regions_and_districts(df):
+    """Extract unique regions and districts from actual data"""
+    def unique(column):
+        values = df[column].dropna()
+        # Sort alphabetically for consistent display
+        return sorted(values[values != ''].unique().tolist())
     
-    return regions, districts
+    return unique('properties.region'), unique('properties.district')
 
 def main():
     # Load GeoJSON data FIRST (before sidebar) to get available filters
     geojson_path = "data/geojson/latest_detections.geojson"
-    geojson_data_full = load_geojson_data(geojson_path)
+    detections_df = load_detections_frame(geojson_path, file_version(geojson_path))
     
     # Get unique regions and districts from actual data
-    available_regions, available_districts = get_unique_regions_and_districts(geojson_data_full)
+    available_regions, available_districts = get_unique_regions_and_districts(detections_df)
     
     # Sidebar
     with st.sidebar:
@@ -321,7 +484,8 @@ def main():
         language = st.selectbox(
             "Language / Kasa",
             options=['en', 'tw'],
-            format_func=lambda x: 'English' if x == 'en' else 'Twi'
+            format_func=lambda x: 'English' if x == 'en' else 'Twi',
+            key='lang_sel'
         )
         
         t = TRANSLATIONS[language]
@@ -329,21 +493,27 @@ def main():
         st.markdown("---")
         
         # Region filter - DYNAMIC (populated from actual data)
-        region_options = [t['all_regions']] + available_regions
-        region = st.selectbox(
+        # Option values stay in English and only the "all" entry is translated
+        region_options = ['All Regions'] + available_regions
+        region_english = st.selectbox(
             t['select_region'],
-            region_options
+            region_options,
+            index=carried_index('region_sel', region_options, language),
+            format_func=lambda x: t['all_regions'] if x == 'All Regions' else x,
+            key='region_sel'
         )
-        
-        # Map region back to English for filtering
-        region_english = 'All Regions' if region == t['all_regions'] else region
+        st.session_state['region_sel_choice'] = region_english
         
         # District filter - DYNAMIC (populated from actual data)
-        district_options = [t['all_districts']] + available_districts
-        district = st.selectbox(t['select_district'], district_options)
-        
-        # Map district back to English
-        district_english = 'All Districts' if district == t['all_districts'] else district
+        district_options = ['All Districts'] + available_districts
+        district_english = st.selectbox(
+            t['select_district'],
+            district_options,
+            index=carried_index('district_sel', district_options, language),
+            format_func=lambda x: t['all_districts'] if x == 'All Districts' else x,
+            key='district_sel'
+        )
+        st.session_state['district_sel_choice'] = district_english
         
         # Date range
         st.markdown("---")
@@ -351,7 +521,8 @@ def main():
         date_range = st.date_input(
             "date_range_input",
             value=(datetime.now() - timedelta(days=30), datetime.now()),
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            key='date_range'
         )
         
         st.markdown("---")
@@ -367,49 +538,37 @@ def main():
     st.markdown(f"<h1 class='main-header'>{t['title']}</h1>", unsafe_allow_html=True)
     st.markdown(f"<p style='text-align: center; color: #666;'>{t['subtitle']}</p>", unsafe_allow_html=True)
     
-    # geojson_data_full already loaded at top of main() for filters
+    # Apply all filters as one boolean mask over the cached frame
+    mask = pd.Series(True, index=detections_df.index)
     
-    # Apply filters
-    geojson_filtered = geojson_data_full
-    
-    # Filter by region
     if region_english != 'All Regions':
-        geojson_filtered = filter_geojson_by_region(geojson_filtered, region_english)
+        mask &= detections_df['properties.region'] == region_english
     
-    # Filter by district
     if district_english != 'All Districts':
-        geojson_filtered = filter_geojson_by_district(geojson_filtered, district_english)
+        mask &= detections_df['properties.district'] == district_english
     
-    # Filter by date
     if len(date_range) == 2:
-        geojson_filtered = filter_geojson_by_date(geojson_filtered, date_range[0], date_range[1])
+        # Features with a missing or unparsable date are kept
+        dates = detections_df['date_parsed']
+        mask &= dates.isna() | dates.between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+    
+    kept = np.flatnonzero(mask)
+    filtered_df = detections_df.iloc[kept]
+    # Identifies the filtered set for the map and download caches
+    filter_key = (file_version(geojson_path), kept.tobytes())
     
     # Calculate metrics from FILTERED data
-    total_sites = len(geojson_filtered.get('features', []))
+    total_sites = len(filtered_df)
     
     # Count sites by alert level
-    high_risk_count = 0
-    medium_risk_count = 0
-    new_sites_7d = 0
+    risk_counts = filtered_df['risk'].value_counts()
+    high_risk_count = int(risk_counts['HIGH'])
+    medium_risk_count = int(risk_counts['MEDIUM'])
     
-    for feature in geojson_filtered.get('features', []):
-        props = feature.get('properties', {})
-        confidence = props.get('confidence', 0)
-        
-        # Count by alert level
-        if confidence >= 0.80:
-            high_risk_count += 1
-        elif confidence >= 0.5:
-            medium_risk_count += 1
-        
-        # Count new sites in last 7 days
-        if 'date' in props:
-            try:
-                feature_date = datetime.strptime(props['date'], '%Y-%m-%d')
-                if (datetime.now() - feature_date).days <= 7:
-                    new_sites_7d += 1
-            except:
-                pass
+    # Count new sites in last 7 days: (now - date).days <= 7, i.e. detected
+    # less than 8 days ago; missing or unparsable dates are not counted
+    week_start = pd.Timestamp(datetime.now()) - pd.Timedelta(days=8)
+    new_sites_7d = int((filtered_df['date_parsed'] > week_start).sum())
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
@@ -450,8 +609,19 @@ def main():
     st.subheader(f"🗺️ {t['detection_map']}")
     
     # Create and display map with FILTERED data and language support
-    map_obj = create_map(geojson_filtered, language)
-    st_folium(map_obj, width=None, height=600)
+    if len(filtered_df) > DECK_MIN_POINTS:
+        # The deck.gl map has hover tooltips and no satellite layer — say so
+        st.caption(t['fast_map_note'].format(count=len(filtered_df), limit=DECK_MIN_POINTS))
+        st.pydeck_chart(create_deck(filtered_df, language), use_container_width=True)
+    else:
+        # Rebuilding the Folium map is the slowest part of a rerun, so keep the
+        # rendered HTML until the language, data file or filtered set changes
+        map_key = hash((language, filter_key))
+        if st.session_state.get('map_key') != map_key:
+            map_obj = create_map(filtered_df, language)
+            st.session_state['map_html'] = map_obj.get_root().render()
+            st.session_state['map_key'] = map_key
+        components.html(st.session_state['map_html'], height=600)
     
     # Recent detections table
     st.markdown("---")
@@ -462,31 +632,18 @@ def main():
     
     with col_header2:
         # Row selector
+        row_options = [10, 25, 50, 100, 'All']
         num_rows = st.selectbox(
             t['rows_to_display'],
-            options=[10, 25, 50, 100, 'All'],
-            index=0
+            options=row_options,
+            index=carried_index('rows_sel', row_options, language),
+            key='rows_sel'
         )
+        st.session_state['rows_sel_choice'] = num_rows
     
-    # Convert GeoJSON features to DataFrame with FILTERED data
-    if geojson_filtered and 'features' in geojson_filtered and len(geojson_filtered['features']) > 0:
-        table_data = []
-        for feature in geojson_filtered['features']:
-            props = feature.get('properties', {})
-            coords = feature.get('geometry', {}).get('coordinates', [0, 0])
-            
-            table_data.append({
-                t['date']: props.get('date', 'N/A'),
-                t['district']: props.get('district', 'Unknown'),
-                t['region']: props.get('region', 'Unknown'),
-                t['latitude']: f"{coords[1]:.6f}°",
-                t['longitude']: f"{coords[0]:.6f}°",
-                t['confidence']: props.get('confidence', 0.0),
-                t['area_ha']: props.get('area_ha', 0.0),
-                t['alert_level']: props.get('alert_level', 'LOW')
-            })
-        
-        df = pd.DataFrame(table_data)
+    # Table straight from the cached frame with FILTERED data
+    if len(filtered_df) > 0:
+        df = detections_to_display(filtered_df, t)
         
         # Sort by date (most recent first)
         df = df.sort_values(t['date'], ascending=False)
@@ -497,19 +654,14 @@ def main():
         else:
             df_display = df
         
-        # Format confidence as percentage
-        df_display[t['confidence']] = df_display[t['confidence']].apply(lambda x: f"{x:.1%}")
-        
-        # Style the dataframe
-        def color_alert(val):
-            if val == 'HIGH':
-                return 'background-color: #ffcdd2'
-            elif val == 'MEDIUM':
-                return 'background-color: #ffe0b2'
-            else:
-                return 'background-color: #c8e6c9'
-        
-        styled_df = df_display.style.map(color_alert, subset=[t['alert_level']])
+        # Style the dataframe: one CSS lookup per row, anything other than
+        # HIGH/MEDIUM gets the LOW colour; formatting is display-only
+        alert_css = {'HIGH': 'background-color: #ffcdd2', 'MEDIUM': 'background-color: #ffe0b2'}
+        styled_df = (df_display.style
+                     .format('{:.1%}', subset=[t['confidence']])
+                     .format('{:.6f}°', subset=[t['latitude'], t['longitude']])
+                     .apply(lambda col: col.map(alert_css).fillna('background-color: #c8e6c9'),
+                            subset=[t['alert_level']]))
         st.dataframe(styled_df, use_container_width=True, hide_index=True)
         
         # Show count
@@ -526,7 +678,7 @@ def main():
     with col1:
         st.download_button(
             label=f"📥 {t['download_geojson']}",
-            data=json.dumps(geojson_filtered, indent=2),
+            data=geojson_download_bytes(filtered_df, filter_key),
             file_name=f"famm_detections_{datetime.now().strftime('%Y%m%d')}.geojson",
             mime="application/json"
         )
@@ -534,8 +686,7 @@ def main():
     with col2:
         if 'df' in locals() and not df.empty:
             # Prepare full dataset for CSV download (all rows, not just displayed)
-            df_download = df.copy()
-            csv_data = df_download.to_csv(index=False)
+            csv_data = csv_download_bytes(df, filter_key, language)
             st.download_button(
                 label=f"📥 {t['download_csv']} ({len(df)} rows)",
                 data=csv_data,
@@ -4,11 +4,34 @@ FAMM GeoJSON Validator & Cleaner (Append Mode)
 
 """
 
+import functools
+import hashlib
 import json
+import logging
+import os
+import re
 import sys
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
 # ── Rosemary's thresholds — authoritative ─────────────────────────────────────
 def remap_alert_level(confidence: float) -> str:
     if confidence > 0.8:
@@ -22,6 +45,7 @@ REQUIRED_FIELDS = [
     "confidence", "district", "region",
     "date", "area_ha", "tile_id", "alert_level"
 ]
+_REQUIRED_SET = frozenset(REQUIRED_FIELDS)
 
 DISTRICT_TO_REGION = {
     "Kwabre":       "Ashanti Region",
@@ -45,23 +69,54 @@ DISTRICT_TO_REGION = {
 }
 
 
+# First character of each space- or hyphen-separated part
+_WORD_START = re.compile(r"(?<![^ -]).", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=1024)
 def title_case_district(name: str) -> str:
-    def cap(part):
-        return part[0].upper() + part[1:] if part else part
-    return " ".join(
-        "-".join(cap(p) for p in word.split("-"))
-        for word in name.split(" ")
-    )
+    return _WORD_START.sub(lambda m: m.group().upper(), name)
 
 
+# One case-insensitive pass finds every known district name inside a string.
+# The lookahead lets matches overlap, so the earliest DISTRICT_TO_REGION entry
+# still wins as it did with the per-key substring scan.
+_FB_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in DISTRICT_TO_REGION) + "))",
+    re.IGNORECASE,
+)
+_FB_LOWER = {k.lower(): v for k, v in DISTRICT_TO_REGION.items()}
+_FB_RANK  = {k.lower(): i for i, k in enumerate(DISTRICT_TO_REGION)}
+
+
+@functools.lru_cache(maxsize=1024)
 def fallback_region(district: str):
-    for key, region in DISTRICT_TO_REGION.items():
-        if key.lower() in district.lower():
-            return region
-    return None
+    # No key contains another, so an exact name can only match itself
+    region = DISTRICT_TO_REGION.get(district)
+    if region is not None:
+        return region
+    hits = [m.group(1).lower() for m in _FB_PATTERN.finditer(district)]
+    if not hits:
+        return None
+    return _FB_LOWER[min(hits, key=_FB_RANK.__getitem__)]
+
+
+# Canonical YYYY-MM-DD with a day every month has; anything else (29th–31st,
+# unpadded fields) is left to strptime so the accepted set is unchanged.
+_DATE_FAST = re.compile(
+    r"(?!0000)\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|1\d|2[0-8])", re.ASCII
+).fullmatch
 
 
 def validate_date(s: str) -> bool:
+    if isinstance(s, str) and _DATE_FAST(s):
+        return True
+    return _validate_date_slow(s)
+
+
+# A batch carries only a handful of distinct dates, so strptime runs once per date
+@functools.lru_cache(maxsize=1024)
+def _validate_date_slow(s: str) -> bool:
     try:
         datetime.strptime(s, "%Y-%m-%d")
         return True
@@ -69,6 +124,93 @@ def validate_date(s: str) -> bool:
         return False
 
 
+# Buffer size for the streamed input and the feature-per-line output
+IO_BUFFER = 1 << 20
+
+
+def read_json(path: str):
+    """Parse a JSON file, with orjson when it is installed."""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def iter_input_features(f):
+    """
+    Yield the features of an open (binary) FeatureCollection one at a time.
+    Streams with ijson when it is installed; otherwise parses the whole file.
+    """
+    if ijson is not None:
+        yield from ijson.items(f, "features.item", use_float=True)
+        return
+    data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+    yield from data.get("features", [])
+
+
+# Errors a malformed input raises, from whichever parser is in use
+JSON_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+_FC_HEAD = b'{"type": "FeatureCollection", "features": [\n'
+_FC_TAIL = b"\n]}\n"
+
+
+def _compact_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def write_feature_collection(features: list, path: str,
+                             pretty: bool = False) -> None:
+    """
+    Write a FeatureCollection one compact feature per line, so the whole
+    document is never built in memory. pretty=True writes the old indented
+    layout instead, for reading the file by hand.
+    """
+    if pretty:
+        with open(path, "w") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f,
+                      indent=2)
+        return
+    with open(path, "wb", buffering=IO_BUFFER) as f:
+        f.write(_FC_HEAD)
+        for i, ft in enumerate(features):
+            if i:
+                f.write(b",\n")
+            f.write(_compact_dumps(ft))
+        f.write(_FC_TAIL)
+
+
+def append_features(features: list, path: str) -> bool:
+    """
+    Append features to a FeatureCollection written by write_feature_collection
+    by rewriting only its closing bracket. Returns False, leaving the file as it
+    was, when the file is not in that layout (e.g. written with --pretty).
+    """
+    with open(path, "r+b", buffering=IO_BUFFER) as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < len(_FC_HEAD) + len(_FC_TAIL):
+            return False
+        f.seek(size - len(_FC_TAIL))
+        if f.read() != _FC_TAIL:
+            return False
+        f.seek(0)
+        if f.read(len(_FC_HEAD)) != _FC_HEAD:
+            return False
+        sep = b"" if size == len(_FC_HEAD) + len(_FC_TAIL) else b",\n"
+        f.seek(size - len(_FC_TAIL))
+        f.truncate()
+        for ft in features:
+            f.write(sep)
+            f.write(_compact_dumps(ft))
+            sep = b",\n"
+        f.write(_FC_TAIL)
+    return True
+
+
 def load_existing(output_file: str) -> tuple[list, set]:
     """
     Load existing features from the output file.
@@ -77,8 +219,7 @@ def load_existing(output_file: str) -> tuple[list, set]:
     if not Path(output_file).exists():
         return [], set()
     try:
-        with open(output_file) as f:
-            data = json.load(f)
+        data = read_json(output_file)
         existing = data.get("features", [])
         keys = {
             (ft["properties"].get("tile_id", ""),
@@ -87,33 +228,150 @@ def load_existing(output_file: str) -> tuple[list, set]:
         }
         return existing, keys
     except (json.JSONDecodeError, KeyError):
-        print(f"  ⚠️  Could not read existing file — starting fresh.")
+        log.warning("  ⚠️  Could not read existing file — starting fresh.")
         return [], set()
 
 
-def clean_feature(feature: dict, index: int) -> tuple[dict | None, str | None]:
+def source_digest(path: str) -> str:
     """
-    Validate and clean a single feature.
-    Returns (cleaned_feature, None) on success or (None, reason) on failure.
+    blake2b of a file's bytes. Sidecars store it to detect any edit to the
+    GeoJSON, including ones that keep its size.
     """
-    props = feature.get("properties", {})
-    geom  = feature.get("geometry", {})
+    st = Path(path).stat()
+    return _source_digest(str(path), st.st_size, st.st_mtime_ns)
 
-    missing = [f for f in REQUIRED_FIELDS if f not in props]
-    if missing:
-        return None, f"Missing fields: {missing}"
 
+@functools.lru_cache(maxsize=8)
+def _source_digest(path: str, size: int, mtime_ns: int) -> str:
+    # size and mtime only key the in-process cache; the content is what's hashed
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(IO_BUFFER):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def key_index_path(output_file: str) -> Path:
+    return Path(f"{output_file}.keys")
+
+
+def index_row(props: dict) -> tuple:
+    """The (tile_id, date, alert_level, region) row kept in the key index."""
+    return (str(props.get("tile_id", "")), str(props.get("date", "")),
+            str(props["alert_level"]), str(props["region"]))
+
+
+def load_key_index(output_file: str) -> list | None:
+    """
+    Read the key index written next to the output, one tab-separated row per
+    feature. Returns None when it is missing or no longer matches the output,
+    in which case the history has to be parsed instead.
+    """
+    try:
+        with open(key_index_path(output_file), encoding="utf-8") as f:
+            label, digest = f.readline().rstrip("\n").split("\t")
+            if label != "source_digest" or digest != source_digest(output_file):
+                return None
+            rows = [tuple(line.rstrip("\n").split("\t")) for line in f]
+    except (OSError, ValueError):
+        return None
+    if any(len(r) != 4 for r in rows):
+        return None
+    return rows
+
+
+def _index_header(output_file: str) -> str:
+    # Fixed width, so an append can overwrite it in place
+    return f"source_digest\t{source_digest(output_file)}\n"
+
+
+def write_key_index(rows: list, output_file: str) -> None:
+    """Write the key index, stamped with the output's digest so edits to it are noticed."""
+    with open(key_index_path(output_file), "w", encoding="utf-8",
+              buffering=IO_BUFFER) as f:
+        f.write(_index_header(output_file))
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+
+
+def append_key_index(rows: list, output_file: str) -> bool:
+    """
+    Add rows to the key index and restamp its header after an append.
+    Returns False when the header cannot be replaced in place.
+    """
+    header = _index_header(output_file)
+    with open(key_index_path(output_file), "r+", encoding="utf-8") as f:
+        if len(f.readline()) != len(header):
+            return False
+        f.seek(0)
+        f.write(header)
+        f.seek(0, os.SEEK_END)
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+    return True
+
+
+def read_parquet_sidecar(output_file: str):
+    """The Parquet copy of the history, or None if it is missing or stale."""
+    if pd is None:
+        return None
+    try:
+        df = pd.read_parquet(Path(output_file).with_suffix(".parquet"))
+    except (OSError, ImportError, ValueError):
+        return None
+    if df.attrs.get("source_digest") != source_digest(output_file):
+        return None
+    return df
+
+
+def write_parquet_sidecar(features: list, output_file: str,
+                          base=None) -> Path | None:
+    """
+    Write a columnar copy of the history next to the GeoJSON for the dashboard.
+    The GeoJSON's content digest is stored with it so a stale copy is ignored.
+    With base (the previous copy), only the given new features are converted.
+    Returns the Parquet path, or None when pandas/pyarrow are unavailable.
+    """
+    if pd is None:
+        return None
+    parquet_path = Path(output_file).with_suffix(".parquet")
+    df = pd.DataFrame.from_records([ft["properties"] for ft in features])
+    coords = [ft["geometry"]["coordinates"] for ft in features]
+    df["lon"] = [c[0] for c in coords]
+    df["lat"] = [c[1] for c in coords]
+    if base is not None:
+        df = pd.concat([base, df], ignore_index=True)
+    df.attrs["source_digest"] = source_digest(output_file)
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except (ImportError, TypeError, ValueError) as e:
+        log.warning("  ⚠️  Parquet copy not written (%s) — dashboard will read the GeoJSON.", e)
+        return None
+    return parquet_path
+
+
+def clean_feature(feature: dict, index: int) -> tuple[dict | None, str | None]:
+    """
+    Validate and clean a single feature, rewriting its properties in place.
+    Returns (cleaned_feature, None) on success or (None, reason) on failure.
+    """
+    # Cheapest rejection first; a null geometry is rejected rather than raising
+    geom   = feature.get("geometry") or {}
     coords = geom.get("coordinates", [])
     if len(coords) < 2:
         return None, "Invalid coordinates"
 
+    props = feature.get("properties", {})
+    if not _REQUIRED_SET.issubset(props):
+        missing = [f for f in REQUIRED_FIELDS if f not in props]
+        return None, f"Missing fields: {missing}"
+
     confidence = float(props["confidence"])
     district   = str(props["district"]).strip()
     region     = str(props["region"]).strip()
     date_str   = str(props["date"]).strip()
     area_ha    = float(props["area_ha"])
-    tile_id    = str(props.get("tile_id", ""))
-    alert_in   = str(props.get("alert_level", "")).strip()
+    tile_id    = str(props["tile_id"])
 
     if not validate_date(date_str):
         return None, f"Bad date format: {date_str!r}"
@@ -128,122 +386,170 @@ def clean_feature(feature: dict, index: int) -> tuple[dict | None, str | None]:
         fb     = fallback_region(district_fixed)
         region = fb if fb else "Unknown Region"
 
-    return {
-        "type": "Feature",
-        "geometry": geom,
-        "properties": {
-            "confidence":  round(confidence, 4),
-            "district":    district_fixed,
-            "region":      region,
-            "date":        date_str,
-            "area_ha":     round(area_ha, 2),
-            "tile_id":     tile_id,
-            "alert_level": alert_out,
-        }
-    }, None
+    # A batch has a handful of regions and dates; share one string object for each
+    region   = sys.intern(region)
+    date_str = sys.intern(date_str)
+
+    # The streamed input feature is not used again, so it is reused as the output
+    feature["type"]       = "Feature"
+    feature["properties"] = {
+        "confidence":  round(confidence, 4),
+        "district":    district_fixed,
+        "region":      region,
+        "date":        date_str,
+        "area_ha":     round(area_ha, 2),
+        "tile_id":     tile_id,
+        "alert_level": alert_out,
+    }
+    return feature, None
 
 
 def validate_and_clean(input_file: str, output_file: str,
-                        overwrite: bool = False) -> bool:
-    print("=" * 60)
-    print("FAMM GeoJSON Validator (Append Mode)")
-    print(f"  Input  : {input_file}")
-    print(f"  Output : {output_file}")
-    print(f"  Mode   : {'OVERWRITE' if overwrite else 'APPEND'}")
-    print("=" * 60)
-
-    # ── Load new input ────────────────────────────────────────────────────────
+                        overwrite: bool = False, pretty: bool = False) -> bool:
+    log.info("=" * 60)
+    log.info("FAMM GeoJSON Validator (Append Mode)")
+    log.info("  Input  : %s", input_file)
+    log.info("  Output : %s", output_file)
+    log.info("  Mode   : %s", "OVERWRITE" if overwrite else "APPEND")
+    log.info("=" * 60)
+
+    # ── Open new input (features are streamed below) ──────────────────────────
     try:
-        with open(input_file) as f:
-            data = json.load(f)
+        input_fh = open(input_file, "rb", buffering=IO_BUFFER)
     except FileNotFoundError:
-        print(f"ERROR: Input not found: {input_file}")
-        return False
-    except json.JSONDecodeError as e:
-        print(f"ERROR: Invalid JSON: {e}")
+        log.error("ERROR: Input not found: %s", input_file)
         return False
 
-    raw = data.get("features", [])
-    print(f"\n📥 New features from inference  : {len(raw)}")
-
     # ── Load existing history (unless overwrite) ───────────────────────────────
+    # The key index is enough for dedup and the summary; the features themselves
+    # are only parsed if the output has to be rewritten.
+    existing_features = []
     if overwrite:
-        existing_features, existing_keys = [], set()
-        print(f"📂 Existing history             : skipped (overwrite mode)")
+        index_rows, existing_keys = [], set()
     else:
-        existing_features, existing_keys = load_existing(output_file)
-        print(f"📂 Existing features in history : {len(existing_features)}")
+        index_rows = load_key_index(output_file)
+        if index_rows is None:
+            existing_features, existing_keys = load_existing(output_file)
+            index_rows = [index_row(ft["properties"]) for ft in existing_features]
+        else:
+            existing_features = None
+            existing_keys     = {(r[0], r[1]) for r in index_rows}
+    n_existing = len(index_rows)
+
+    # ── Summary counts, seeded from history and updated as features are kept ─
+    alert_counts  = Counter(r[2] for r in index_rows)
+    region_counts = Counter(r[3] for r in index_rows)
+    week_counts   = Counter(r[1] for r in index_rows)
 
     # ── Clean new features ────────────────────────────────────────────────────
     cleaned  = []
     skipped  = []
     dupes    = 0
-
-    for i, feat in enumerate(raw):
-        result, reason = clean_feature(feat, i)
-        if result is None:
-            skipped.append((i, reason))
-            continue
-
-        # Deduplication check
-        key = (result["properties"]["tile_id"],
-               result["properties"]["date"])
-        if key in existing_keys:
-            dupes += 1
-            continue
-
-        cleaned.append(result)
-        existing_keys.add(key)   # prevent dupes within this batch too
-
-    # ── Combine and save ──────────────────────────────────────────────────────
-    all_features = existing_features + cleaned
-    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, "w") as f:
-        json.dump({"type": "FeatureCollection", "features": all_features}, f,
-                  indent=2)
+    n_raw    = 0
+
+    with input_fh:
+        try:
+            for i, feat in enumerate(iter_input_features(input_fh)):
+                n_raw = i + 1
+                result, reason = clean_feature(feat, i)
+                if result is None:
+                    skipped.append((i, reason))
+                    continue
+
+                # Deduplication check
+                key = (result["properties"]["tile_id"],
+                       result["properties"]["date"])
+                if key in existing_keys:
+                    dupes += 1
+                    continue
+
+                cleaned.append(result)
+                existing_keys.add(key)   # prevent dupes within this batch too
+                p = result["properties"]
+                index_rows.append(index_row(p))
+                alert_counts[p["alert_level"]] += 1
+                region_counts[p["region"]]     += 1
+                week_counts[p["date"]]         += 1
+        except JSON_ERRORS as e:
+            log.error("ERROR: Invalid JSON: %s", e)
+            return False
+
+    log.info("\n📥 New features from inference  : %s", n_raw)
+    if overwrite:
+        log.info("📂 Existing history             : skipped (overwrite mode)")
+    else:
+        log.info("📂 Existing features in history : %s", n_existing)
+
+    # ── Save: append in place when the history is indexed, else rewrite it ──
+    parquet_path = None
+    appended     = False
+    if existing_features is None and cleaned and not pretty:
+        base     = read_parquet_sidecar(output_file)
+        appended = append_features(cleaned, output_file)
+        if appended:
+            if base is not None:
+                parquet_path = write_parquet_sidecar(cleaned, output_file, base=base)
+            elif pd is not None:
+                all_features, _ = load_existing(output_file)
+                parquet_path = write_parquet_sidecar(all_features, output_file)
+            if not append_key_index(index_rows[n_existing:], output_file):
+                write_key_index(index_rows, output_file)
+
+    if not appended and (existing_features is not None or cleaned):
+        if existing_features is None:
+            existing_features, _ = load_existing(output_file)
+        all_features = existing_features + cleaned
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        write_feature_collection(all_features, output_file, pretty=pretty)
+        parquet_path = write_parquet_sidecar(all_features, output_file)
+        write_key_index(index_rows, output_file)
 
     # ── Summary ───────────────────────────────────────────────────────────────
-    alert_counts  = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
-    region_counts = {}
-    week_counts   = {}
-
-    for feat in all_features:
-        p = feat["properties"]
-        alert_counts[p["alert_level"]] = alert_counts.get(p["alert_level"], 0) + 1
-        region_counts[p["region"]]     = region_counts.get(p["region"], 0) + 1
-        week_counts[p["date"]]         = week_counts.get(p["date"], 0) + 1
-
-    print(f"\n{'─'*60}")
-    print("RESULTS")
-    print(f"{'─'*60}")
-    print(f"  New detections added     : {len(cleaned)}")
-    print(f"  Duplicates skipped       : {dupes}")
-    print(f"  Invalid features skipped : {len(skipped)}")
-    print(f"  Total in history now     : {len(all_features)}")
-    print(f"\n  Alert levels (Rosemary thresholds  HIGH>0.8, MEDIUM>0.5):")
+    log.info("\n%s", "─" * 60)
+    log.info("RESULTS")
+    log.info("─" * 60)
+    log.info("  New detections added     : %s", len(cleaned))
+    log.info("  Duplicates skipped       : %s", dupes)
+    log.info("  Invalid features skipped : %s", len(skipped))
+    log.info("  Total in history now     : %s", len(index_rows))
+    log.info("\n  Alert levels (Rosemary thresholds  HIGH>0.8, MEDIUM>0.5):")
     for lvl in ("HIGH", "MEDIUM", "LOW"):
-        print(f"    {lvl:6s}: {alert_counts.get(lvl, 0)}")
-    print(f"\n  Regions:")
+        log.info("    %-6s: %s", lvl, alert_counts.get(lvl, 0))
+    log.info("\n  Regions:")
     for r, c in sorted(region_counts.items()):
-        print(f"    {r}: {c}")
-    print(f"\n  Detections by date (all history):")
+        log.info("    %s: %s", r, c)
+    log.info("\n  Detections by date (all history):")
+    latest = max(week_counts, default=None)
     for d, c in sorted(week_counts.items()):
-        marker = " ← this run" if d == max(week_counts) else ""
-        print(f"    {d}: {c} detection(s){marker}")
+        marker = " ← this run" if d == latest else ""
+        log.info("    %s: %s detection(s)%s", d, c, marker)
     if skipped:
-        print(f"\n  Skipped features:")
+        log.info("\n  Skipped features:")
         for idx, reason in skipped:
-            print(f"    Feature {idx}: {reason}")
-    print(f"\n✅ Saved to: {output_file}")
-    print("=" * 60)
+            log.info("    Feature %s: %s", idx, reason)
+    log.info("\n✅ Saved to: %s", output_file)
+    if parquet_path:
+        log.info("✅ Parquet copy : %s", parquet_path)
+    # At WARNING so the outcome still shows under --quiet, and for importers
+    # that never configured logging (Python's last-resort handler prints it)
+    log.warning("✅ %s added, %s duplicate(s), %s invalid — %s in history",
+                len(cleaned), dupes, len(skipped), len(index_rows))
+    log.info("=" * 60)
     return True
 
 
 if __name__ == "__main__":
     overwrite = "--overwrite" in sys.argv
+    pretty    = "--pretty" in sys.argv
+    quiet     = "--quiet" in sys.argv
     args      = [a for a in sys.argv[1:] if not a.startswith("--")]
 
     inp = args[0] if len(args) > 0 else "asm_monitoring_results.geojson"
     out = args[1] if len(args) > 1 else "data/geojson/latest_detections.geojson"
 
-    sys.exit(0 if validate_and_clean(inp, out, overwrite=overwrite) else 1)
\ No newline at end of file
+    # --quiet keeps only the one-line outcome, warnings and errors
+    logging.basicConfig(level=logging.WARNING if quiet else logging.INFO,
+                        format="%(message)s", stream=sys.stdout)
+
+    sys.exit(0 if validate_and_clean(inp, out, overwrite=overwrite,
+                                         pretty=pretty) else 1)
\ No newline at end of file